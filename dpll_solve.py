@@ -1,164 +1,779 @@
-import copy
-    
-def check_done(clauses):
-    """ Figures out if the problem is solved, not solvable, or unfinished. 
+import heapq
+import itertools
+import multiprocessing
+import os
+import queue
+import random
+
+def load_clauses(clauses):
+    """ Flattens the clauses into one list of literals and sets up the watch lists.
+    Every clause with three or more literals watches its first two literals, which
+    are always kept at the front of the clause. A clause with two literals can't
+    move its watches, so it goes straight into the binary lists instead: once one
+    of its literals is false, the other has to be true.
 
     inputs
         clauses: 2D array of clauses
 
     returns
-        True if all clauses are satisfied
-        False if there's a clause that cannot be satisfied
-        None if there are still undetermined clauses left
+        db: dictionary holding the flat clause database and the solver state
+            lits: every literal of every clause, one clause after the other
+            starts, ends: where each clause begins and ends in lits
+            watches: list of literals to the ids of the clauses watching them
+            binary: list of literals to the other literal of each 2-literal clause
+                they are in, followed by that clause's id
+            value: list of literal values, 1 = true, -1 = false, 0 = unassigned
+            trail: list of assigned literals, in the order they were assigned
+            units: literals of the length-1 clauses
+            empty: True if one of the clauses is empty
+            conflict: id of the last clause that had every literal false
     """
-    if(len(clauses) == 0):
-            return True
-            
+    lits = []
+    starts = []
+    ends = []
+    units = []
+    empty = False
     for c in clauses:
-        if(len(c) == 0):
-            return False
+        # repeated literals would break the two watches
+        c = list(dict.fromkeys(c))
+        if len(c) == 0:
+            empty = True
+        elif len(c) == 1:
+            units.append(c[0])
+        starts.append(len(lits))
+        lits.extend(c)
+        ends.append(len(lits))
+    num_vars = max(map(abs, lits), default=0)
 
-    return None
-                
-def assign(assm, p):
-    """ Assigns the literal 'p' to a value in the dictionary 'assm'. If the input is 
-    negated, assigns p to false. If the input is not negated, assigns p to true. 
+    # watches and value are indexed by literal: a negative literal -p wraps
+    # around to the back half of the list, so both halves fit in one list
+    watches = [[] for i in range(2 * num_vars + 1)]
+    binary = [[] for i in range(2 * num_vars + 1)]
+    for i in range(len(starts)):
+        s = starts[i]
+        size = ends[i] - s
+        if size == 2:
+            p = lits[s]
+            q = lits[s + 1]
+            binary[p] += (q, i)
+            binary[q] += (p, i)
+        elif size > 2:
+            watches[lits[s]].append(i)
+            watches[lits[s + 1]].append(i)
+
+    # value[0] is never used, it is set so that it is never picked as unassigned
+    value = [0] * (2 * num_vars + 1)
+    value[0] = 1
+
+    return {"lits": lits, "starts": starts, "ends": ends, "watches": watches,
+            "binary": binary, "value": value, "trail": [], "units": units, "empty": empty,
+            "conflict": None}
+
+def assign(db, p):
+    """ Assigns the literal 'p' to true and records it on the trail. If the input
+    is negated, its variable is assigned to false, otherwise it is assigned to true.
 
     inputs
-        assm: dictionary of literal assignments
+        db: dictionary holding the clause database and the solver state
         p: a literal represented by an integer value
+
+    returns
+        False if p is already false, True otherwise
     """
-    if p >= 0:
-        assm[abs(p)] = 1
+    value = db["value"]
+    if value[p] != 0:
+        return value[p] == 1
+    value[p] = 1
+    value[-p] = -1
+    db["trail"].append(p)
+    return True
+
+def propagate(db, qhead):
+    """ Runs unit propagation on the literals of the trail starting at 'qhead'.
+    The 2-literal clauses with the negation of a newly assigned literal just
+    need their other literal to be true. Other than those, only the clauses
+    watching the negation of a newly assigned literal are visited.
+    Each of them either finds a new literal to watch, is already satisfied,
+    becomes a unit clause and assigns its other watched literal, or has no
+    literal left that can be true, which is a conflict.
+
+    inputs
+        db: dictionary holding the clause database and the solver state
+        qhead: index of the first literal on the trail that hasn't been propagated
+
+    returns
+        False if there was a conflict, True otherwise
+    """
+    lits = db["lits"]
+    starts = db["starts"]
+    ends = db["ends"]
+    watches = db["watches"]
+    binary = db["binary"]
+    value = db["value"]
+    trail = db["trail"]
+
+    while qhead < len(trail):
+        false_lit = -trail[qhead]
+        qhead += 1
+
+        # binary holds (other literal, clause id) pairs back to back
+        implied = binary[false_lit]
+        for i in range(0, len(implied), 2):
+            other = implied[i]
+            if value[other] == 0:
+                value[other] = 1
+                value[-other] = -1
+                trail.append(other)
+            elif value[other] == -1:
+                db["conflict"] = implied[i + 1]
+                return False
+
+        # the watch list is compacted in place, j is where the next kept watch goes
+        ws = watches[false_lit]
+        size = len(ws)
+        i = 0
+        j = 0
+        while i < size:
+            c = ws[i]
+            i += 1
+            s = starts[c]
+
+            # keep the false literal in the second spot
+            other = lits[s]
+            if other == false_lit:
+                other = lits[s + 1]
+                lits[s] = other
+                lits[s + 1] = false_lit
+            if value[other] == 1:
+                ws[j] = c
+                j += 1
+                continue
+
+            # look for another literal that isn't false to watch instead
+            for k in range(s + 2, ends[c]):
+                q = lits[k]
+                if value[q] != -1:
+                    lits[s + 1] = q
+                    lits[k] = false_lit
+                    watches[q].append(c)
+                    break
+            else:
+                ws[j] = c
+                j += 1
+                if value[other] == -1:
+                    # every literal is false, keep the rest of the watches and stop
+                    db["conflict"] = c
+                    while i < size:
+                        ws[j] = ws[i]
+                        j += 1
+                        i += 1
+                    del ws[j:]
+                    return False
+
+                # the clause is a unit clause now
+                value[other] = 1
+                value[-other] = -1
+                trail.append(other)
+        del ws[j:]
+
+    return True
+
+def backtrack(db, mark):
+    """ Unassigns the literals on the trail until it is back to length 'mark'.
+
+    inputs
+        db: dictionary holding the clause database and the solver state
+        mark: length of the trail to go back to
+    """
+    value = db["value"]
+    trail = db["trail"]
+    heap = db.get("heap")
+    activity = db.get("activity")
+
+    # cut the whole tail off at once instead of popping one literal at a time
+    undone = trail[mark:]
+    del trail[mark:]
+    for p in undone:
+        value[p] = 0
+        value[-p] = 0
+
+    # the variables can be picked again
+    if heap is not None:
+        for p in undone:
+            v = abs(p)
+            heapq.heappush(heap, (-activity[v], v))
+
+# decision heuristics, see init_activity()
+HEURISTICS = ["vsids", "order", "reverse", "max_occurrence", "min_occurrence", "random"]
+
+def init_activity(db, heuristic="vsids", seed=0):
+    """ Sets up the decision heuristic. Every variable has an activity, and the
+    unassigned variable with the highest activity is decided on next.
+    A heap of (-activity, variable) gives the most active variable; entries
+    that are out of date are skipped when they come up.
+
+    For "vsids", activities start at how many clauses the variable shows up in,
+    so the most constrained variables go first. The variables of each conflicting
+    clause get bumped, and every so often the bump grows instead of all activities
+    decaying, which keeps recent conflicts counting most without touching every
+    variable. "random" works the same way but starts from random activities.
+    The other heuristics never change their activities: "order" and "reverse"
+    go by variable number, "max_occurrence" and "min_occurrence" by how many
+    clauses the variable shows up in.
+
+    inputs
+        db: dictionary holding the clause database and the solver state
+        heuristic: one of HEURISTICS
+        seed: random seed for the "random" heuristic
+    """
+    num_vars = len(db["value"]) // 2
+    occurrences = [0.0] * (num_vars + 1)
+    for p in db["lits"]:
+        occurrences[abs(p)] += 1.0
+    top = max(occurrences)
+    if top > 0:
+        occurrences = [a / top for a in occurrences]
+
+    if heuristic == "vsids" or heuristic == "max_occurrence":
+        activity = occurrences
+    elif heuristic == "min_occurrence":
+        activity = [-a for a in occurrences]
+    elif heuristic == "order":
+        activity = [float(-v) for v in range(num_vars + 1)]
+    elif heuristic == "reverse":
+        activity = [float(v) for v in range(num_vars + 1)]
+    elif heuristic == "random":
+        rand = random.Random(seed)
+        activity = [rand.random() for v in range(num_vars + 1)]
     else:
-        assm[abs(p)] = 0
-    
-def simplify(clauses, p):
-    """ Updates clauses to reflect the impact of the assignment of literal 'p'.
-    If clauses are now satisfied by p, they can be removed. If clauses are not 
-    satisfied by p, then p is no longer relevant and is removed from the clause.
+        raise ValueError("Unknown heuristic: " + str(heuristic))
+
+    db["activity"] = activity
+    db["bump"] = 1.0 if heuristic == "vsids" or heuristic == "random" else 0.0
+    db["decisions"] = 0
+    rebuild_heap(db)
+
+def rebuild_heap(db):
+    """ Rebuilds the decision heap out of the unassigned variables, dropping
+    every out of date entry.
 
     inputs
-        clauses: 2D array of clauses
+        db: dictionary holding the clause database and the solver state
+    """
+    value = db["value"]
+    activity = db["activity"]
+    heap = [(-activity[v], v) for v in range(1, len(activity)) if value[v] == 0]
+    heapq.heapify(heap)
+    db["heap"] = heap
+
+def bump_clause(db, c):
+    """ Bumps the activity of every variable in clause 'c'.
+
+    inputs
+        db: dictionary holding the clause database and the solver state
+        c: clause id
+    """
+    activity = db["activity"]
+    heap = db["heap"]
+    lits = db["lits"]
+    bump = db["bump"]
+    if bump == 0:
+        return
+    for k in range(db["starts"][c], db["ends"][c]):
+        v = abs(lits[k])
+        activity[v] += bump
+        heapq.heappush(heap, (-activity[v], v))
+
+    # scale everything back down before the floats overflow, the order stays the same
+    if bump > 1e100:
+        for v in range(len(activity)):
+            activity[v] *= 1e-100
+        db["bump"] = bump * 1e-100
+        rebuild_heap(db)
+
+def pick_var(db):
+    """ Picks the next variable to decide on.
+
+    inputs
+        db: dictionary holding the clause database and the solver state
+
+    returns
+        the unassigned variable with the highest activity, or 0 if every
+        variable is assigned already
+    """
+    db["decisions"] += 1
+    if db["decisions"] % 256 == 0:
+        db["bump"] /= 0.95
+
+    value = db["value"]
+    activity = db["activity"]
+    heap = db["heap"]
+
+    # only clear out the out of date entries once there are a lot of them
+    if len(heap) > 4 * len(activity):
+        rebuild_heap(db)
+        heap = db["heap"]
+    while heap:
+        a, v = heapq.heappop(heap)
+        if value[v] == 0 and -a == activity[v]:
+            return v
+    return 0
+
+def mix(c, h):
+    """ Scrambles a clause's removed-literal hash into the hash of the whole
+    formula. It isn't linear in XOR, so two clauses that lost the same literal
+    don't cancel each other out.
+
+    inputs
+        c: clause id
+        h: XOR of the random values of the literals removed from the clause
+
+    returns
+        64-bit hash of the clause in its current state
+    """
+    h = ((h ^ c) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    return h ^ (h >> 29)
+
+def init_memo(db):
+    """ Sets up the cache of unsatisfiable formulas. Each remaining formula is
+    identified by an incrementally updated hash of its active clauses and the
+    literals that have been removed from them.
+
+    inputs
+        db: dictionary holding the clause database and the solver state
+    """
+    rand = random.Random(0)
+    size = len(db["value"])
+    occurs = [[] for i in range(size)]
+    lits = db["lits"]
+    for c in range(len(db["starts"])):
+        for k in range(db["starts"][c], db["ends"][c]):
+            occurs[lits[k]].append(c)
+
+    key = 0
+    for c in range(len(db["starts"])):
+        key ^= mix(c, 0)
+
+    db["occurs"] = occurs
+    db["zobrist"] = [rand.getrandbits(64) for i in range(size)]
+    db["sat_count"] = [0] * len(db["starts"])
+    db["removed"] = [0] * len(db["starts"])
+    db["key"] = key
+    db["unsat_cache"] = set()
+
+def hash_literals(db, start):
+    """ Updates the formula hash for the literals on the trail from 'start' on.
+    Clauses that just got a true literal leave the formula, clauses that are
+    still active and just got a false literal change their hash.
+
+    inputs
+        db: dictionary holding the clause database and the solver state
+        start: index of the first literal on the trail to hash
+    """
+    occurs = db["occurs"]
+    zobrist = db["zobrist"]
+    sat_count = db["sat_count"]
+    removed = db["removed"]
+    key = db["key"]
+    trail = db["trail"]
+    for i in range(start, len(trail)):
+        p = trail[i]
+        for c in occurs[p]:
+            sat_count[c] += 1
+            if sat_count[c] == 1:
+                key ^= mix(c, removed[c])
+        for c in occurs[-p]:
+            h = removed[c]
+            removed[c] = h ^ zobrist[-p]
+            if sat_count[c] == 0:
+                key ^= mix(c, h) ^ mix(c, removed[c])
+    db["key"] = key
+
+def unhash_literals(db, start):
+    """ Undoes hash_literals() for the literals on the trail from 'start' on.
+
+    inputs
+        db: dictionary holding the clause database and the solver state
+        start: index of the first literal on the trail to unhash
+    """
+    occurs = db["occurs"]
+    zobrist = db["zobrist"]
+    sat_count = db["sat_count"]
+    removed = db["removed"]
+    key = db["key"]
+    trail = db["trail"]
+    for i in range(len(trail) - 1, start - 1, -1):
+        p = trail[i]
+        for c in occurs[-p]:
+            h = removed[c]
+            removed[c] = h ^ zobrist[-p]
+            if sat_count[c] == 0:
+                key ^= mix(c, h) ^ mix(c, removed[c])
+        for c in occurs[p]:
+            if sat_count[c] == 1:
+                key ^= mix(c, removed[c])
+            sat_count[c] -= 1
+    db["key"] = key
+
+def try_literal(db, p, mark):
+    """ Assigns the literal 'p' and propagates it. If that leads to a conflict,
+    the conflicting clause is bumped and everything is undone again.
+
+    inputs
+        db: dictionary holding the clause database and the solver state
         p: a literal represented by an integer value
+        mark: length of the trail before p is assigned
+
+    returns
+        False if there was a conflict, True otherwise
+    """
+    assign(db, p)
+    if propagate(db, mark):
+        if "key" in db:
+            hash_literals(db, mark)
+        return True
+    bump_clause(db, db["conflict"])
+    backtrack(db, mark)
+    return False
+
+def undo_literal(db, mark):
+    """ Undoes a try_literal() that didn't have a conflict.
+
+    inputs
+        db: dictionary holding the clause database and the solver state
+        mark: length of the trail before the literal was assigned
+    """
+    if "key" in db:
+        unhash_literals(db, mark)
+    backtrack(db, mark)
+
+def solve_sat(db):
+    """ Solves the rest of the satisfiability problem. Done once every variable
+    is assigned without a conflict. Otherwise, pick the most active variable that
+    hasn't been assigned yet, try assigning it to false then propagate and go on.
+    If that doesn't work, try assigning it to true. If neither works, go back
+    to the last decision that hasn't tried true yet.
+    If memoizing, remaining formulas already known to be unsatisfiable are
+    skipped, and new ones are remembered.
+
+    The decisions are kept on a stack of [variable, trail length before it,
+    tried true] instead of recursing, so there is no limit on how deep it goes.
+
+    inputs
+        db: dictionary holding the clause database and the solver state
 
     returns
-        copy_clauses: 2D array of clauses, updated to remove references to literal 'p'
-    """
-    copy_clauses = copy.deepcopy(clauses) 
-    i = 0
-    while i < len(copy_clauses):
-    
-        # get rid of clauses that are now satisfied by true
-        if p in copy_clauses[i]:
-            del copy_clauses[i]
-            
-        # get rid of references to this bc it's unhelpful as false
+        sat: boolean that is true if satisfiable, false otherwise
+    """
+    memoize = "key" in db
+    trail = db["trail"]
+    stack = []
+    while True:
+        if memoize and db["key"] in db["unsat_cache"]:
+            # the last decision led somewhere known to be unsatisfiable
+            undone = False
         else:
-            if -p in copy_clauses[i]:
-                copy_clauses[i].remove(-p)
-            i += 1
+            p = pick_var(db)
+            if p == 0:
+                return True
+            mark = len(trail)
+            stack.append([p, mark, False])
+
+            # try false first
+            if try_literal(db, -p, mark):
+                continue
+            undone = True
+
+        # go back to the last decision that can still try true
+        while stack:
+            frame = stack[-1]
+            p, mark, tried_true = frame
+            if not undone:
+                undo_literal(db, mark)
+            if not tried_true:
+                frame[2] = True
+                if try_literal(db, p, mark):
+                    break
+                undone = True
+            else:
+                # neither worked, so the formula before this decision is unsatisfiable
+                stack.pop()
+                if memoize:
+                    db["unsat_cache"].add(db["key"])
+                undone = False
+        else:
+            return False
+
+def get_vars(value):
+    """ Turns the literal values into the assignments list, 1 if the variable
+    is true and 0 otherwise.
+
+    inputs
+        value: list of literal values, 1 = true, -1 = false, 0 = unassigned
+
+    returns
+        assm: list of variables to their assignments, assm[0] is unused
+    """
+    assm = [0] * (len(value) // 2 + 1)
+    for v in range(1, len(assm)):
+        if value[v] == 1:
+            assm[v] = 1
+    return assm
+
+def assign_unit_clauses(db):
+    """ Assigns the literals that show up in a length-1 clause and therefore
+    have an obvious and necessary assignment value. They are only queued up
+    on the trail here, propagate() works through the queue afterwards.
+
+    inputs
+        db: dictionary holding the clause database and the solver state
+
+    returns
+        False if there was a conflict, True otherwise
+    """
+    if db["empty"]:
+        return False
+    for p in db["units"]:
+        if not assign(db, p):
+            return False
+    return True
+
+def assign_pure_literals(db):
+    """ Assigns pure literals - literals whose negation doesn't show up in
+    any clause, so making them true can only satisfy clauses. Like the unit
+    clauses, they are only queued up on the trail here.
+
+    inputs
+        db: dictionary holding the clause database and the solver state
+    """
+    value = db["value"]
+    seen = [False] * len(value)
+    for p in db["lits"]:
+        seen[p] = True
+    for p in range(1, len(value) // 2 + 1):
+        if seen[p] != seen[-p]:
+            assign(db, p if seen[p] else -p)
+
+def dpll(clauses, memoize=False, heuristic="vsids", seed=0, assumptions=()):
+    """ Solves the satisfiability problem. Sets up the clause database,
+    assigns unit clauses and pure literals, and runs the solver.
+
+    inputs
+        clauses: 2D array of clauses
+        memoize: if True, cache the remaining formulas found to be unsatisfiable
+        heuristic: how to pick the next variable to decide on, one of HEURISTICS
+        seed: random seed for the "random" heuristic
+        assumptions: literals to assign to true along with the unit clauses
+
+    returns
+        sat: boolean that is true if satisfiable, false otherwise
+        assm: list of variables to satisfying assignments
+    """
+    db = load_clauses(clauses)
+
+    # assign the variables that can only go one way, then propagate them all
+    sat = assign_unit_clauses(db)
+    for p in assumptions:
+        sat = sat and assign(db, p)
+    if sat:
+        assign_pure_literals(db)
+        sat = propagate(db, 0)
+
+    # search for an assignment to the rest of the problem
+    if sat:
+        init_activity(db, heuristic, seed)
+        if memoize:
+            init_memo(db)
+            hash_literals(db, 0)
+        sat = solve_sat(db)
+    return sat, get_vars(db["value"])
+
+def wait_for_result(results, workers, every=False):
+    """ Waits for the next result from the worker processes, checking every
+    so often that the result can still come. A worker that crashes or gets
+    killed never reports its result, so waiting for it would never end.
+
+    inputs
+        results: queue the workers put their results on
+        workers: list of the worker processes
+        every: if True, the result is lost as soon as any worker has failed,
+            otherwise only once no worker is running anymore
+
+    returns
+        the result, or None if it is never going to come
+    """
+    while True:
+        try:
+            return results.get(timeout=0.1)
+        except queue.Empty:
+            pass
+        running = any(worker.exitcode is None for worker in workers)
+        failed = any(worker.exitcode not in (None, 0) for worker in workers)
+        if not running or (every and failed):
+            # the result may have come in right as the worker exited
+            try:
+                return results.get(timeout=0.1)
+            except queue.Empty:
+                return None
 
-    return copy_clauses
+def portfolio_worker(clauses, heuristic, seed, results, done):
+    """ Runs dpll() with one heuristic in a separate process and reports the
+    result, unless another worker has finished first.
 
-def solve_sat(clauses, assm):
-    """ Recursively solves the rest of the satisfiability problem. Base case: 
-    we have determined satisfiability using check_done(). Otherwise, pick
-    a literal that hasn't been assigned yet, try assigning it to false then
-    recurse. If that doesn't work, try assigning it to true then recurse.
+    inputs
+        clauses: 2D array of clauses
+        heuristic: how to pick the next variable to decide on, one of HEURISTICS
+        seed: random seed for the "random" heuristic
+        results: queue to put the (sat, assm) result on
+        done: event that is set once a worker has a result
+    """
+    result = dpll(clauses, heuristic=heuristic, seed=seed)
+    if not done.is_set():
+        done.set()
+        results.put(result)
+
+def dpll_portfolio(clauses, processes=None):
+    """ Solves the satisfiability problem with several processes at once, each
+    using a different decision heuristic. How long dpll() takes can change a lot
+    with the order of the decisions, so the first one to finish wins and the
+    others are stopped.
 
     inputs
         clauses: 2D array of clauses
-        assm: dictionary of literal assignments
+        processes: number of processes to run, defaults to the number of CPUs
 
     returns
         sat: boolean that is true if satisfiable, false otherwise
-        assm: dictionary of literals to satisfying assignments
-    """ 
-    result = check_done(clauses)
-    if result != None:
-        return result, assm
-
-    copy_assm = copy.deepcopy(assm)
-    val_list = list(copy_assm.values())
-    key_list = list(copy_assm.keys())
-    idx = val_list.index(None)
-    p = key_list[idx]
-
-    # try false first
-    assign(copy_assm, -p)
-    copy_clauses = simplify(clauses, -p)
-    result = solve_sat(copy_clauses, copy_assm)
-    if(result[0]): return result
-    
-    # if that didn't work, try true
-    assign(copy_assm, p)
-    copy_clauses = simplify(clauses, p)
-    return solve_sat(copy_clauses, copy_assm)
-
-def get_vars(clauses):
-    """ Picks out all of the literals from the clauses to create
-    the assignments dictionary. 
+        assm: list of variables to satisfying assignments
+
+    raises
+        RuntimeError: if every process exits without a result
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes <= 1:
+        return dpll(clauses)
+
+    # once the fixed heuristics are used up, use random ones with different seeds
+    strategies = [(h, 0) for h in HEURISTICS]
+    strategies += [("random", seed) for seed in range(1, processes)]
+    strategies = strategies[:processes]
+
+    results = multiprocessing.Queue()
+    done = multiprocessing.Event()
+    workers = []
+    for heuristic, seed in strategies:
+        worker = multiprocessing.Process(target=portfolio_worker,
+                                         args=(clauses, heuristic, seed, results, done))
+        worker.start()
+        workers.append(worker)
+
+    try:
+        result = wait_for_result(results, workers)
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+    if result is None:
+        raise RuntimeError("Every solver process exited without a result")
+    return result
+
+def pick_cube_vars(clauses, k):
+    """ Picks the variables to split the search space on. Unit clauses are
+    propagated first, then the 'k' unassigned variables that show up in the
+    most clauses are picked.
 
     inputs
         clauses: 2D array of clauses
+        k: number of variables to pick
 
-    returns 
-        assm: dictionary meant to hold the assignments of the literals
+    returns
+        list of up to k variables, or None if propagation found a conflict
     """
-    assm = dict()
-    for c in clauses:
-        for p in c:
-            assm[abs(p)] = None
-    return assm
+    db = load_clauses(clauses)
+    if not assign_unit_clauses(db) or not propagate(db, 0):
+        return None
+    value = db["value"]
+    occurrences = [0] * (len(value) // 2 + 1)
+    for p in db["lits"]:
+        occurrences[abs(p)] += 1
+    free = [v for v in range(1, len(occurrences)) if value[v] == 0]
+    free.sort(key=lambda v: -occurrences[v])
+    return free[:k]
 
-def assign_pure_literals(clauses, assm):
-    """ Assigns pure literals - literals that show up in a lenth-1 clause 
-    and therefore have an obvious and necessary assignment value. 
+def cube_worker(clauses, cubes, results):
+    """ Runs dpll() on cubes in a separate process until it gets None instead
+    of a cube, and reports the result of each one.
 
     inputs
         clauses: 2D array of clauses
-        assm: dictionary of literal assignments
-
-    returns 
-        clauses: 2D array of clauses updated to remove references to pure literals
-        assm: dictionary of updated literal assignments 
-    """
-    i = 0
-    while i < len(clauses):
-        if(len(clauses[i]) == 1):
-            assign(assm, clauses[i][0])
-            clauses = simplify(clauses, clauses[i][0])
-            i = 0
-        else:
-            i += 1
-    return clauses, assm
+        cubes: queue of cubes, lists of literals to assign to true before solving
+        results: queue to put the (sat, assm) results on
+    """
+    cube = cubes.get()
+    while cube is not None:
+        results.put(dpll(clauses, assumptions=cube))
+        cube = cubes.get()
 
-def dpll(clauses):
-    """ Solves the satisfiability problem. First checks whether satisfiability 
-    has been determined using check_done(). Otherwise, it sets up the variable 
-    assignment dictionary, assigns pure literals, and runs the solver.
+def dpll_cubes(clauses, k=4, processes=None):
+    """ Solves the satisfiability problem by splitting it into 2^k smaller ones,
+    one for each way of assigning 'k' of the most constrained variables (the
+    cubes), and solving those in parallel. The first satisfiable cube stops the
+    others; the problem is only unsatisfiable if every cube is.
 
     inputs
         clauses: 2D array of clauses
+        k: number of variables to split on
+        processes: number of processes to run, defaults to the number of CPUs
 
     returns
         sat: boolean that is true if satisfiable, false otherwise
-        assm: dictionary of literals to satisfying assignments
-    """ 
+        assm: list of variables to satisfying assignments
+
+    raises
+        RuntimeError: if a process exits without finishing its cube
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    variables = pick_cube_vars(clauses, k)
+    if processes <= 1 or not variables:
+        return dpll(clauses)
 
-    # see if the problem is already solved
-    result = check_done(clauses)
-    if result != None: return result
+    # each process takes the next cube once it is done with one, until it gets None
+    cubes = multiprocessing.Queue()
+    num_cubes = 0
+    for bits in itertools.product([False, True], repeat=len(variables)):
+        cubes.put([v if bit else -v for v, bit in zip(variables, bits)])
+        num_cubes += 1
+    for i in range(processes):
+        cubes.put(None)
 
-    assm = get_vars(clauses)
+    results = multiprocessing.Queue()
+    workers = []
+    for i in range(min(processes, num_cubes)):
+        worker = multiprocessing.Process(target=cube_worker, args=(clauses, cubes, results))
+        worker.start()
+        workers.append(worker)
 
-    # assign the variables that can only go one way
-    clauses, assm = assign_pure_literals(clauses, assm)
-    
-    # solve the rest of the unit clauses recursively
-    return solve_sat(clauses, assm)
+    # a worker that fails takes its cube with it, so then the answer can't be trusted
+    try:
+        for i in range(num_cubes):
+            result = wait_for_result(results, workers, every=True)
+            if result is None or result[0]:
+                break
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
 
+        # the cubes nobody got to would otherwise keep this process from exiting
+        cubes.cancel_join_thread()
+        cubes.close()
+    if result is None:
+        raise RuntimeError("A solver process exited without finishing its cube")
+    return result
 
 # DO NOT USE 0 AS A LITERAL AS IT CANNOT HOLD A SIGN VALUE
 # Small test cases provided below
@@ -3,13 +3,35 @@ import dpll_solve
 import sys
 import os
 import ast 
+import itertools
+import hashlib
+import pickle
 
-def clue_clauses(n, s, clues, clauses):
+# PySAT is optional, without it the puzzles are solved with our own dpll solver
+try:
+    from pysat.solvers import Glucose4
+except ImportError:
+    Glucose4 = None
+
+def var(n, x, y, z):
+    """ Maps a (row, col, val) combination to its unique integer identifier.
+    The identifiers of one location's values are next to each other, then the
+    locations go along the row, then down the rows.
+
+    inputs
+        n: the size of the sudoku puzzle
+        x, y, z: the row, column and value, starting at 0
+
+    returns
+        integer identifier, starting at 1
+    """
+    return n*n*n*n*x + n*n*y + z + 1
+
+def clue_clauses(n, clues, clauses):
     """ Creates clauses to enforce the given sudoku clues. 
     
     inputs
         n: the size of the sudoku puzzle
-        s: 3D array, maps each (row, col, val) combination to a unique integer identifier
         clues: dictionary of sudoku puzzle clues as (x,y)-locations mapped to z-values
         clauses: 2D array of clauses with literals represented by integers
     """
@@ -17,133 +39,110 @@ def clue_clauses(n, s, clues, clauses):
     # assigns the variable corresponding to each location + value to true, then
     # assigns the rest of the variables corresponding to that location to false
     for (x,y),z in clues.items():
-        for i in range(n*n):
-            if i == z-1:
-                clauses.append([s[x-1][y-1][i]])
-            else:
-                clauses.append([-s[x-1][y-1][i]])
+        first = var(n, x-1, y-1, 0)
+        clauses.extend([[first+i] if i == z-1 else [-(first+i)] for i in range(n*n)])
 
-def fill_val_clauses(n, s, clauses):
-    """ Creates clauses to ensure there is at least one number in each location. 
+def fill_clauses(n, clauses, use_extended=False):
+    """ Creates clauses to ensure there is at least one number in each location.
+    With the extended encoding, it also ensures each number appears at least once
+    in each row and each column, all in the same pass.
 
     inputs
         n: the size of the sudoku puzzle
-        s: 3D array, maps each (row, col, val) combination to a unique integer identifier
         clauses: 2D array of clauses with literals represented by integers
+        use_extended: if True, also create the row and column clauses
     """
     for x in range(n*n):
-        for y in range(n*n):
-            long_clause = []
-            for z in range(n*n):
-                long_clause.append(s[x][y][z])
-            clauses.append(long_clause)
+        # the clauses for row x are added a whole row at a time
+        clauses.extend([list(range(var(n, x, y, 0), var(n, x, y, n*n))) for y in range(n*n)])
+        if use_extended:
+            # value y in row x, then value y in column x
+            clauses.extend([list(range(var(n, x, 0, y), var(n, x+1, 0, y), n*n)) for y in range(n*n)])
+            clauses.extend([list(range(var(n, 0, x, y), var(n, n*n, x, y), n*n*n*n)) for y in range(n*n)])
 
-def fill_row_clauses(n, s, clauses):
-    """ Creates clauses to ensure each number appears at least once in each row. 
+def at_most_one(variables, clauses):
+    """ Creates clauses to ensure at most one of the given variables is true,
+    one 2-literal clause for every pair of them.
 
     inputs
-        n: the size of the sudoku puzzle
-        s: 3D array, maps each (row, col, val) combination to a unique integer identifier
+        variables: list of integer identifiers
         clauses: 2D array of clauses with literals represented by integers
     """
-    for y in range(n*n):
-        for z in range(n*n):
-            long_clause = []
-            for x in range(n*n):
-                long_clause.append(s[x][y][z])
-            clauses.append(long_clause)
-
-def fill_col_clauses(n, s, clauses):
-    """ Creates clauses to ensure each number appears at least once in each column. 
-
-    inputs
-        n: the size of the sudoku puzzle
-        s: 3D array, maps each (row, col, val) combination to a unique integer identifier
-        clauses: 2D array of clauses with literals represented by integers
-    """
-    for x in range(n*n):
-        for z in range(n*n):
-            long_clause = []
-            for y in range(n*n):
-                long_clause.append(s[x][y][z])
-            clauses.append(long_clause)
+    clauses.extend([[-a, -b] for a, b in itertools.combinations(variables, 2)])
 
-def row_clauses(n, s, clauses):
+def row_clauses(n, clauses):
     """ Creates clauses to ensure each number appears at most once in each row. 
 
     inputs
         n: the size of the sudoku puzzle
-        s: 3D array, maps each (row, col, val) combination to a unique integer identifier
         clauses: 2D array of clauses with literals represented by integers
     """
 
     # if a value z shows up twice in row x, the clause will not be satisfied
     for x in range(n*n):
-        for y in range(n*n-1):
-            for z in range(n*n):
-                for i in range(y+1,n*n):
-                    clauses.append([-s[x][y][z], -s[x][i][z]])
+        for z in range(n*n):
+            at_most_one(range(var(n, x, 0, z), var(n, x+1, 0, z), n*n), clauses)
 
-def col_clauses(n, s, clauses):
+def col_clauses(n, clauses):
     """ Creates clauses to ensure each number appears at most once in each column. 
 
     inputs
         n: the size of the sudoku puzzle
-        s: 3D array, maps each (row, col, val) combination to a unique integer identifier
         clauses: 2D array of clauses with literals represented by integers
     """
 
     # if a value z shows up twice in column y, the clause will not be satisfied
-    for x in range(n*n-1):
-        for y in range(n*n):
-            for z in range(n*n):
-                for i in range(x+1,n*n):
-                    clauses.append([-s[x][y][z], -s[i][y][z]])
+    for y in range(n*n):
+        for z in range(n*n):
+            at_most_one(range(var(n, 0, y, z), var(n, n*n, y, z), n*n*n*n), clauses)
 
-def val_clauses(n, s, clauses):
+def val_clauses(n, clauses):
     """ Creates clauses to ensure there is at most one number in each entry.
 
     inputs
         n: the size of the sudoku puzzle
-        s: 3D array, maps each (row, col, val) combination to a unique integer identifier
         clauses: 2D array of clauses with literals represented by integers
     """
 
-    # if a value z shows up twice in column y, the clause will not be satisfied
+    # if two values show up in entry (x,y), the clause will not be satisfied
     for x in range(n*n):
         for y in range(n*n):
-            for z in range(n*n-1):
-                for i in range(z+1,n*n):
-                    clauses.append([-s[x][y][z], -s[x][y][i]])
+            at_most_one(range(var(n, x, y, 0), var(n, x, y, n*n)), clauses)
 
-def box_clauses(n, s, clauses):
+def box_clauses(n, clauses):
     """ Creates clauses to ensure each number appears at most once in each sub-grid. 
 
     inputs
         n: the size of the sudoku puzzle
-        s: 3D array, maps each (row, col, val) combination to a unique integer identifier
         clauses: 2D array of clauses with literals represented by integers
     """
 
-    # clauses that check values in the same row & box but in neighboring columns
-    for x in range(n):
-        for y in range(n):
-            for z in range(n*n):
-                for i in range(n):
-                    for j in range(n):
-                        for k in range(y+1, n):
-                            clauses.append([-s[n*i+x][n*j+y][z], -s[n*i+x][n*j+k][z]])
-
-    # clauses that check values in the same column & box but in neighboring rows, 
-    # as well as values that are in the same box but in a different row & column
-    for x in range(n):
-        for y in range(n):
-            for z in range(n*n):
-                for i in range(n):
-                    for j in range(n):
-                        for k in range(x+1, n):
-                            for l in range(n):
-                                clauses.append([-s[n*i+x][n*j+y][z], -s[n*i+k][n*j+l][z]])
+    # the identifiers of the first value of each location in each sub-grid, worked out once
+    boxes = [[var(n, n*i+x, n*j+y, 0) for x in range(n) for y in range(n)] for i in range(n) for j in range(n)]
+
+    # if a value z shows up twice in a sub-grid, the clause will not be satisfied
+    for box in boxes:
+        for z in range(n*n):
+            at_most_one([v + z for v in box], clauses)
+
+def make_clauses(n, clues, clauses, use_extended=False):
+    """ Creates all of the clauses for the sudoku puzzle.
+
+    inputs
+        n: the size of the sudoku puzzle
+        clues: dictionary of sudoku puzzle clues as (x,y)-locations mapped to z-values
+        clauses: 2D array of clauses with literals represented by integers
+        use_extended: if True, adds the redundant clauses to the encoding
+    """
+    clue_clauses(n, clues, clauses)
+    fill_clauses(n, clauses, use_extended)
+    row_clauses(n, clauses)
+    col_clauses(n, clauses)
+    box_clauses(n, clauses)
+
+    # optional extended clauses, can help make complex problems easier to solve
+    if use_extended:
+        val_clauses(n, clauses)
 
 def read_puzzle():
     """ Reads in the sudoku puzzle information from the given file, handles errors.
@@ -197,41 +196,66 @@ def print_puzzle(n, clues):
         print()
     print()
 
-def solve_puzzle(n, s, clues, clauses, use_extended=False):
-    """ Creates the necessary clauses and runs the dpll solver.
+def solve_pysat(clauses):
+    """ Runs the clauses through PySAT's Glucose solver, which is compiled and much
+    faster than the dpll solver, and converts its model to the dpll solver's format.
+
+    inputs
+        clauses: 2D array of clauses with literals represented by integers
+
+    returns
+        sat: boolean that is true if satisfiable, false otherwise
+        assm: list of variables to satisfying assignments
+    """
+    solver = Glucose4()
+    try:
+        solver.append_formula(clauses)
+        sat = solver.solve()
+        model = solver.get_model() if sat else []
+    finally:
+        solver.delete()
+
+    assm = [0] * (len(model) + 1)
+    for p in model:
+        if p > 0:
+            assm[p] = 1
+    return sat, assm
+
+def solve_puzzle(n, clues, clauses, use_extended=False, use_pysat=True, processes=None,
+                 use_cubes=False):
+    """ Creates the necessary clauses and runs the SAT solver. PySAT is used if
+    it is installed, otherwise the dpll solver is run in several processes at once,
+    each with a different decision heuristic, or each on its own part of the
+    search space.
     
     inputs
         n: the size of the sudoku puzzle
-        s: 3D array, maps each (row, col, val) combination to a unique integer identifier
         clues: dictionary of sudoku puzzle clues as (x,y)-locations mapped to z-values
         clauses: 2D array of clauses with literals represented by integers
+        use_extended: if True, adds the redundant clauses to the encoding
+        use_pysat: if False, always uses the dpll solver
+        processes: number of dpll processes to run, defaults to the number of CPUs
+        use_cubes: if True, splits the search space between the dpll processes
     
     returns
         sat: boolean that is true if the puzzle is satisfiable, false otherwise
-        assm: dictionary of literals to their satisfying assignments
+        assm: list of variables to their satisfying assignments
     """
-    clue_clauses(n, s, clues, clauses)
-    fill_val_clauses(n, s, clauses)
-    row_clauses(n, s, clauses)
-    col_clauses(n, s, clauses)
-    box_clauses(n, s, clauses)
-
-    # optional extended clauses, can help make complex problems easier to solve
-    if use_extended:
-        val_clauses(n, s, clauses)
-        fill_row_clauses(n, s, clauses)
-        fill_col_clauses(n, s, clauses)
+    make_clauses(n, clues, clauses, use_extended)
 
     # solver returns boolean satisfiability and final variable assignments
-    return dpll_solve.dpll(clauses)
+    if use_pysat and Glucose4 is not None:
+        return solve_pysat(clauses)
+    if use_cubes:
+        return dpll_solve.dpll_cubes(clauses, processes=processes)
+    return dpll_solve.dpll_portfolio(clauses, processes)
 
-def print_solution(n, s, assm):
+def print_solution(n, assm):
     """ Prints the final puzzle solution using the assignments given by the dpll solver.
     
     inputs
         n: the size of the sudoku puzzle
-        s: 3D array, maps each (row, col, val) combination to a unique integer identifier
-        assm: dictionary of literal assignments
+        assm: list of variable assignments, 1 = true, 0 = false
 
     returns
         sudoku_sol: dictionary of (x,y)-locations to z-values, a concise encoding of the puzzle solution
@@ -240,7 +264,7 @@ def print_solution(n, s, assm):
     for x in range(n*n):
         for y in range(n*n):
             for z in range(n*n):
-                if assm[s[x][y][z]]:
+                if assm[var(n, x, y, z)]:
                     print(z+1, end=" ")
                     sudoku_sol[(x+1,y+1)] = z+1
             if (y+1) % n == 0 and y+1 != n*n:
@@ -252,42 +276,132 @@ def print_solution(n, s, assm):
         print()
     return sudoku_sol
 
-def print_dimacs(n, s, clues, clauses):
-    """ Prints the whole problem in DIMACS format, for easy plug-in to other SAT solvers.
-    
+# solved puzzles are kept here so that solving one again is instant
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".sudoku_cache")
+
+# goes up whenever the cached results change meaning, like when var() numbers
+# the variables differently, so that old cache files are never used
+CACHE_VERSION = 1
+
+def cache_file(n, clues):
+    """ Works out where the result for a puzzle is cached, named after a hash
+    of the cache version and the puzzle's size and clues.
+
     inputs
         n: the size of the sudoku puzzle
-        s: 3D array, maps each (row, col, val) combination to a unique integer identifier
         clues: dictionary of sudoku puzzle clues as (x,y)-locations mapped to z-values
-        clauses: 2D array of clauses with literals represented by integers
+
+    returns
+        path of the cache file
     """
-    for x in range(n*n):
-        for y in range(n*n):
-            for z in range(n*n):
-                print(s[x][y][z], end=" ")
-    print()
-    clue_clauses(n, s, clues, clauses)
-    fill_val_clauses(n, s, clauses)
-    row_clauses(n, s, clauses)
-    col_clauses(n, s, clauses)
-    box_clauses(n, s, clauses)
-    for c in clauses:
-        for l in c:
-            print(l, end=" ")
-        print()
+    key = hashlib.blake2b(repr((CACHE_VERSION, n, sorted(clues.items()))).encode()).hexdigest()
+    return os.path.join(CACHE_DIR, key)
+
+def read_cache(n, clues):
+    """ Reads the cached result for a puzzle, if it has been solved before.
+    A cache file that can't be read or doesn't hold a result for this puzzle
+    is ignored.
 
+    inputs
+        n: the size of the sudoku puzzle
+        clues: dictionary of sudoku puzzle clues as (x,y)-locations mapped to z-values
+
+    returns
+        (sat, assm) as returned by solve_puzzle(), or None if it isn't cached
+    """
+    try:
+        with open(cache_file(n, clues), "rb") as f:
+            result = pickle.load(f)
+    except Exception:
+        return None
+
+    if not isinstance(result, tuple) or len(result) != 2:
+        return None
+    sat, assm = result
+    if not isinstance(sat, bool) or not isinstance(assm, list):
+        return None
+    # an unsatisfiable puzzle doesn't need a full assignment
+    if sat and len(assm) != n**6 + 1:
+        return None
+    return result
+
+def write_cache(n, clues, sat, assm):
+    """ Caches the result for a puzzle. Failing to write it isn't an error,
+    the puzzle just gets solved again next time.
+
+    inputs
+        n: the size of the sudoku puzzle
+        clues: dictionary of sudoku puzzle clues as (x,y)-locations mapped to z-values
+        sat: boolean that is true if the puzzle is satisfiable, false otherwise
+        assm: list of variables to their satisfying assignments
+    """
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_file(n, clues), "wb") as f:
+            pickle.dump((sat, assm), f)
+    except OSError:
+        pass
+
+class ClauseWriter:
+    """ Writes clauses out in DIMACS format as they are created, instead of
+    keeping them in a list. The clause functions only ever add clauses with
+    extend(), so it can be passed to them in place of a list.
+    """
+
+    def __init__(self, out=None):
+        """ Sets up the writer with no clauses written yet.
 
-n, clues = read_puzzle()
-print_puzzle(n, clues)
+        inputs
+            out: file to write the clauses to, if None they are only counted
+        """
+        self.out = out
+        self.count = 0
 
-# maps each (row, col, val) combination to a unique integer identifier
-s = [[[(n*n*n*n*x) + (n*n*y) + z + 1 for x in range(n*n)] for y in range(n*n)] for z in range(n*n)]
-clauses = []
+    def extend(self, cs):
+        """ Writes several clauses at once.
 
-# use_extended adds redundant clauses to the encoding, but makes it easier to solve hard problems
-sat, assm = solve_puzzle(n, s, clues, clauses, use_extended=True)
-print("Solvable?", sat)
-print()
+        inputs
+            cs: 2D array of clauses with literals represented by integers
+        """
+        lines = [" ".join(map(str, c)) + " 0\n" for c in cs]
+        self.count += len(lines)
+        if self.out is not None:
+            self.out.write("".join(lines))
+
+def print_dimacs(n, clues, out=None):
+    """ Prints the whole problem in DIMACS format, for easy plug-in to other SAT solvers.
+    The clauses are written out as they are created, so they are never all in memory
+    at once. They are created twice: once to count them for the header, then again
+    to write them.
+    
+    inputs
+        n: the size of the sudoku puzzle
+        clues: dictionary of sudoku puzzle clues as (x,y)-locations mapped to z-values
+        out: file to write to, defaults to stdout
+    """
+    if out is None:
+        out = sys.stdout
+    counter = ClauseWriter()
+    make_clauses(n, clues, counter)
+    out.write("p cnf " + str(n**6) + " " + str(counter.count) + "\n")
+    make_clauses(n, clues, ClauseWriter(out))
+
+# the guard keeps the solver processes from running the script again when they start
+if __name__ == "__main__":
+    n, clues = read_puzzle()
+    print_puzzle(n, clues)
+
+    # only solve the puzzle if it hasn't been solved before
+    result = read_cache(n, clues)
+    if result is None:
+        clauses = []
+
+        # use_extended adds redundant clauses to the encoding, but makes it easier to solve hard problems
+        result = solve_puzzle(n, clues, clauses, use_extended=True)
+        write_cache(n, clues, *result)
+    sat, assm = result
+    print("Solvable?", sat)
+    print()
 
-if sat:
-    sudoku_sol = print_solution(n, s, assm)
\ No newline at end of file
+    if sat:
+        sudoku_sol = print_solution(n, assm)